@@ -4,66 +4,124 @@
 
 from pathlib import Path
 import requests
+import requests_cache
+from requests.adapters import HTTPAdapter
 import feedparser
 from bs4 import BeautifulSoup
 from urllib.parse import urljoin
+from concurrent.futures import ThreadPoolExecutor
+from itertools import repeat
 from datetime import datetime
-import json
 import sqlite3
-import pandas as pd
+import orjson
+import pyarrow as pa
+import pyarrow.csv as pacsv
 from utils.logger_system import get_logger
+from database_connec.sqlite_connection import get_connection
 
 logger = get_logger("DataIngestion")
 
 
+# ============================================================
+#  DATA STORAGE PATHS
+# ============================================================
+DATA_DIR = Path(r"C:\Users\thang\Desktop\hackthon_project\data")
+DATA_DIR.mkdir(parents=True, exist_ok=True)
+
+DB_PATH = DATA_DIR / "articles.db"
+CSV_PATH = DATA_DIR / "articles_output.csv"
+JSON_PATH = DATA_DIR / "articles_output.json"
+HTTP_CACHE_PATH = DATA_DIR / "http_cache.sqlite"
+
+
+# ============================================================
+#  SHARED HTTP SESSIONS (keep-alive connection pooling)
+# ============================================================
+def _pooled(session):
+    session.headers.update({"User-Agent": "Mozilla/5.0"})
+    session.mount("https://", HTTPAdapter(pool_connections=32, pool_maxsize=32, max_retries=2))
+    return session
+
+
+# API and listing pages must always be fresh
+SESSION = _pooled(requests.Session())
+
+# Article pages rarely change once published, so only they go through the
+# on-disk cache
+ARTICLE_SESSION = _pooled(requests_cache.CachedSession(
+    str(HTTP_CACHE_PATH),
+    expire_after=3600,
+    allowable_methods=("GET",)
+))
+
+
 # ============================================================
 #  RSS INGESTOR
 # ============================================================
+def _parse_one(url, now_iso):
+    try:
+        feed = feedparser.parse(url)
+        logger.info(f"[RSS] {url} → {len(feed.entries)} articles")
+
+        return [
+            {
+                "title": entry.title,
+                "content": getattr(entry, "summary", ""),
+                "link": entry.link,
+                "source": "RSS",
+                "published_at": now_iso
+            }
+            for entry in feed.entries
+        ]
+    except Exception as e:
+        logger.exception(f"RSS error: {url} — {e}")
+        return []
+
+
 def fetch_rss(rss_feeds):
-    all_articles = []
-    for url in rss_feeds:
-        try:
-            feed = feedparser.parse(url)
-            logger.info(f"[RSS] {url} → {len(feed.entries)} articles")
-
-            for entry in feed.entries:
-                article = {
-                    "title": entry.title,
-                    "content": getattr(entry, "summary", ""),
-                    "link": entry.link,
-                    "source": "RSS",
-                    "published_at": datetime.utcnow().isoformat()
-                }
-                all_articles.append(article)
-        except Exception as e:
-            logger.exception(f"RSS error: {url} — {e}")
+    now_iso = datetime.utcnow().isoformat()
+
+    # feedparser blocks on network IO, so fetch every feed concurrently
+    with ThreadPoolExecutor(max_workers=8) as ex:
+        results = list(ex.map(_parse_one, rss_feeds, repeat(now_iso)))
+
+    all_articles = [a for sub in results for a in sub]
     return all_articles
 
 
 # ============================================================
 #  API INGESTOR (GNews)
 # ============================================================
+def _fetch_one_api(url, now_iso):
+    try:
+        resp = SESSION.get(url, timeout=10)
+        data = resp.json()
+        items = data.get("articles", [])
+
+        logger.info(f"[API] {url} → {len(items)} articles")
+
+        return [
+            {
+                "title": item.get("title"),
+                "content": item.get("description") or item.get("content", ""),
+                "link": item.get("url"),
+                "source": "API",
+                "published_at": now_iso
+            }
+            for item in items
+        ]
+    except Exception as e:
+        logger.exception(f"API error: {url} — {e}")
+        return []
+
+
 def fetch_api(api_urls):
-    all_articles = []
-    for url in api_urls:
-        try:
-            resp = requests.get(url, timeout=10)
-            data = resp.json()
-            items = data.get("articles", [])
-
-            logger.info(f"[API] {url} → {len(items)} articles")
-
-            for item in items:
-                article = {
-                    "title": item.get("title"),
-                    "content": item.get("description") or item.get("content", ""),
-                    "link": item.get("url"),
-                    "source": "API",
-                    "published_at": datetime.utcnow().isoformat()
-                }
-                all_articles.append(article)
-        except Exception as e:
-            logger.exception(f"API error: {url} — {e}")
+    now_iso = datetime.utcnow().isoformat()
+
+    with ThreadPoolExecutor(max_workers=8) as ex:
+        results = list(ex.map(_fetch_one_api, api_urls, repeat(now_iso)))
+
+    all_articles = [a for sub in results for a in sub]
     return all_articles
 
 
@@ -72,8 +130,8 @@ def fetch_api(api_urls):
 # ============================================================
 def get_reuters_links(homepage_url):
     try:
-        resp = requests.get(homepage_url, headers={"User-Agent": "Mozilla/5.0"})
-        soup = BeautifulSoup(resp.text, "html.parser")
+        resp = SESSION.get(homepage_url)
+        soup = BeautifulSoup(resp.content, "lxml")
 
         links = set()
 
@@ -90,10 +148,14 @@ def get_reuters_links(homepage_url):
         return []
 
 
-def scrape_reuters_article(url):
+# Shared pool so repeated fetch_scraper calls don't respawn threads
+SCRAPER_EXECUTOR = ThreadPoolExecutor(max_workers=16)
+
+
+def scrape_reuters_article(url, now_iso=None):
     try:
-        resp = requests.get(url, headers={"User-Agent": "Mozilla/5.0"})
-        soup = BeautifulSoup(resp.text, "html.parser")
+        resp = ARTICLE_SESSION.get(url)
+        soup = BeautifulSoup(resp.content, "lxml")
 
         title = soup.find("h1")
         article = soup.find("article")
@@ -112,7 +174,7 @@ def scrape_reuters_article(url):
             "content": content,
             "link": url,
             "source": "SCRAPER",
-            "published_at": datetime.utcnow().isoformat()
+            "published_at": now_iso or datetime.utcnow().isoformat()
         }
 
     except Exception as e:
@@ -120,36 +182,39 @@ def scrape_reuters_article(url):
         return None
 
 
+def load_known_links(db_path=DB_PATH):
+    conn = get_connection(db_path)
+    try:
+        rows = conn.execute("SELECT link FROM raw_articles").fetchall()
+    except sqlite3.OperationalError:
+        # first run — raw_articles has not been created yet
+        rows = []
+    finally:
+        conn.close()
+    return {row[0] for row in rows}
+
+
 def fetch_scraper(pages):
+    now_iso = datetime.utcnow().isoformat()
+    known_links = load_known_links()
+
     all_articles = []
     for page in pages:
-        links = get_reuters_links(page)
+        links = [link for link in get_reuters_links(page) if link not in known_links]
+        logger.info(f"[SCRAPER] {page} → {len(links)} new links to scrape")
 
-        for link in links:
-            article = scrape_reuters_article(link)
-            if article:
-                all_articles.append(article)
+        articles = SCRAPER_EXECUTOR.map(scrape_reuters_article, links, repeat(now_iso))
+        all_articles.extend(a for a in articles if a)
 
         logger.info(f"[SCRAPER] Total so far → {len(all_articles)}")
     return all_articles
 
 
-# ============================================================
-#  DATA STORAGE PATHS
-# ============================================================
-DATA_DIR = Path(r"C:\Users\thang\Desktop\hackthon_project\data")
-DATA_DIR.mkdir(parents=True, exist_ok=True)
-
-DB_PATH = DATA_DIR / "articles.db"
-CSV_PATH = DATA_DIR / "articles_output.csv"
-JSON_PATH = DATA_DIR / "articles_output.json"
-
-
 # ============================================================
 #  SAVE FUNCTIONS
 # ============================================================
 def save_to_sqlite(articles, db_path=DB_PATH):
-    conn = sqlite3.connect(str(db_path))
+    conn = get_connection(db_path)
     cur = conn.cursor()
 
     cur.execute("""
@@ -163,30 +228,31 @@ def save_to_sqlite(articles, db_path=DB_PATH):
         )
     """)
 
-    for a in articles:
-        try:
-            cur.execute("""
-                INSERT OR IGNORE INTO raw_articles
-                (title, content, link, source, published_at)
-                VALUES (?, ?, ?, ?, ?)
-            """, (a["title"], a["content"], a["link"], a["source"], a["published_at"]))
-        except Exception:
-            pass
-
-    conn.commit()
+    rows = [
+        (a["title"], a["content"], a["link"], a["source"], a["published_at"])
+        for a in articles
+    ]
+
+    with conn:
+        cur.executemany("""
+            INSERT OR IGNORE INTO raw_articles
+            (title, content, link, source, published_at)
+            VALUES (?, ?, ?, ?, ?)
+        """, rows)
+
     conn.close()
     logger.info(f"SQLite saved → {len(articles)} articles → {db_path}")
 
 
 def save_to_csv(articles, csv_file=CSV_PATH):
-    df = pd.DataFrame(articles)
-    df.to_csv(csv_file, index=False)
+    table = pa.Table.from_pylist(articles)
+    pacsv.write_csv(table, str(csv_file))
     logger.info(f"CSV saved → {csv_file}")
 
 
 def save_to_json(articles, json_file=JSON_PATH):
-    with open(json_file, "w", encoding="utf-8") as f:
-        json.dump(articles, f, indent=4)
+    with open(json_file, "wb") as f:
+        f.write(orjson.dumps(articles, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY))
     logger.info(f"JSON saved → {json_file}")
 
 
@@ -216,19 +282,23 @@ def run_ingestion():
         "https://www.reuters.com/business/"
     ]
 
-    # Fetch data
-    rss_data = fetch_rss(rss_feeds)
-    api_data = fetch_api(api_urls)
-    scraper_data = fetch_scraper(scraper_pages)
+    # Fetch data — the three sources are independent, so overlap them
+    with ThreadPoolExecutor(max_workers=3) as ex:
+        rss_future = ex.submit(fetch_rss, rss_feeds)
+        api_future = ex.submit(fetch_api, api_urls)
+        scraper_future = ex.submit(fetch_scraper, scraper_pages)
+
+        rss_data = rss_future.result()
+        api_data = api_future.result()
+        scraper_data = scraper_future.result()
 
     final_data = rss_data + api_data + scraper_data
 
     logger.info(f"TOTAL ARTICLES COLLECTED → {len(final_data)}")
 
-    # Save outputs
-    save_to_sqlite(final_data)
-    save_to_csv(final_data)
-    save_to_json(final_data)
+    # Save outputs — independent files, so overlap the disk writes
+    with ThreadPoolExecutor(max_workers=3) as ex:
+        list(ex.map(lambda save: save(final_data), [save_to_sqlite, save_to_csv, save_to_json]))
 
     return final_data
 
@@ -0,0 +1,21 @@
+# src/database_connec/sqlite_connection.py
+
+import sqlite3
+
+# WAL lets readers run alongside a writer; NORMAL sync is safe under WAL
+# and avoids the extra fsync per commit that FULL forces.
+PRAGMAS = """
+    PRAGMA journal_mode=WAL;
+    PRAGMA synchronous=NORMAL;
+    PRAGMA temp_store=MEMORY;
+    PRAGMA cache_size=-65536;
+"""
+
+
+def get_connection(db_path):
+    """
+    Returns a SQLite connection tuned for bulk pipeline writes.
+    """
+    conn = sqlite3.connect(str(db_path), check_same_thread=False)
+    conn.executescript(PRAGMAS)
+    return conn
@@ -2,12 +2,15 @@
 
 import sqlite3
 import pandas as pd
-import hashlib
+import numpy as np
+import torch
+import orjson
 from pathlib import Path
-from sentence_transformers import SentenceTransformer, util
+from sentence_transformers import SentenceTransformer
 
 # Import Logger
 from utils.logger_system import get_logger
+from database_connec.sqlite_connection import get_connection
 logger = get_logger("Deduplication")
 
 # ================================
@@ -21,8 +24,11 @@ UNIQUE_DB_PATH    = DATA_DIR / "unique_articles.db" # final output DB
 CSV_PATH          = DATA_DIR / "unique_articles.csv"
 JSON_PATH         = DATA_DIR / "unique_articles.json"
 
-# Load MiniLM embedding model
-model = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
+# Load MiniLM embedding model (fp16 on GPU when available)
+DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
+model = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2", device=DEVICE)
+if DEVICE == "cuda":
+    model.half()
 
 
 # ======================================
@@ -41,18 +47,13 @@ def load_processed_articles():
 
 
 # ======================================
-# 2. EXACT DUPLICATE REMOVAL (HASH)
+# 2. EXACT DUPLICATE REMOVAL
 # ======================================
-def generate_hash(text):
-    return hashlib.md5(text.encode("utf-8")).hexdigest()
-
 def remove_exact_duplicates(df):
-    logger.info("Running exact deduplication using MD5 hashing...")
-
-    df["hash"] = df["clean_text"].apply(generate_hash)
+    logger.info("Running exact deduplication on clean_text...")
 
     before = len(df)
-    df = df.drop_duplicates(subset=["hash"])
+    df = df.drop_duplicates(subset=["clean_text"], keep="first").reset_index(drop=True)
     after = len(df)
 
     logger.info(f"Exact duplicates removed: {before - after}")
@@ -62,29 +63,36 @@ def remove_exact_duplicates(df):
 # ======================================
 # 3. SEMANTIC DUPLICATE REMOVAL
 # ======================================
-def remove_semantic_duplicates(df, threshold=0.82):
+def remove_semantic_duplicates(df, threshold=0.82, block_size=1024):
     logger.info("Starting semantic deduplication...")
 
     texts = df["clean_text"].tolist()
-    embeddings = model.encode(texts, convert_to_tensor=True)
-
+    embeddings = model.encode(
+        texts,
+        convert_to_tensor=True,
+        normalize_embeddings=True,
+        batch_size=256
+    )
+
+    n = len(texts)
+    removed_mask = np.zeros(n, dtype=bool)
     keep = []
-    removed = 0
-
-    for i in range(len(df)):
-        if i in keep:
-            continue
 
-        keep.append(i)
-        sims = util.cos_sim(embeddings[i], embeddings)[0].cpu().numpy()
+    # Embeddings are unit-normalized, so E @ E.T is the cosine matrix.
+    # Compute it one block of rows at a time to bound memory at block_size x N.
+    for start in range(0, n, block_size):
+        dup_block = (embeddings[start:start + block_size] @ embeddings.T > threshold).cpu().numpy()
 
-        for j in range(i + 1, len(df)):
-            if j in keep:
+        for offset, dup_row in enumerate(dup_block):
+            i = start + offset
+            if removed_mask[i]:
                 continue
-            if sims[j] > threshold:
-                removed += 1
-                logger.debug(f"Removed semantic duplicate: row {j} similar to row {i}")
 
+            keep.append(i)
+            dup_row[: i + 1] = False  # only rows after i can be its duplicates
+            removed_mask |= dup_row
+
+    removed = n - len(keep)
     logger.info(f"Semantic duplicates removed: {removed}")
 
     unique_df = df.iloc[keep]
@@ -97,7 +105,7 @@ def remove_semantic_duplicates(df, threshold=0.82):
 def save_unique_to_sqlite(df):
     logger.info("Saving unique articles to SQLite database...")
 
-    conn = sqlite3.connect(UNIQUE_DB_PATH)
+    conn = get_connection(UNIQUE_DB_PATH)
     cur = conn.cursor()
 
     cur.execute("""
@@ -110,18 +118,16 @@ def save_unique_to_sqlite(df):
         )
     """)
 
-    for _, row in df.iterrows():
-        cur.execute("""
+    rows = list(
+        df[["id", "clean_text", "source", "published_at"]].itertuples(index=False, name=None)
+    )
+
+    with conn:
+        cur.executemany("""
             INSERT INTO unique_articles (processed_id, clean_text, source, published_at)
             VALUES (?, ?, ?, ?)
-        """, (
-            row["id"],
-            row["clean_text"],
-            row["source"],
-            row["published_at"]
-        ))
-
-    conn.commit()
+        """, rows)
+
     conn.close()
     logger.info(f"Saved {len(df)} unique articles into SQLite → {UNIQUE_DB_PATH}")
 
@@ -138,7 +144,9 @@ def save_unique_to_csv(df):
 # 6. SAVE TO JSON
 # ======================================
 def save_unique_to_json(df):
-    df.to_json(JSON_PATH, orient="records", indent=4, force_ascii=False)
+    records = df.to_dict(orient="records")
+    with open(JSON_PATH, "wb") as f:
+        f.write(orjson.dumps(records, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY))
     logger.info(f"Saved unique articles JSON → {JSON_PATH}")
 
 
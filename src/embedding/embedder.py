@@ -1,5 +1,6 @@
 import sqlite3
 import pandas as pd
+import torch
 from pathlib import Path
 from sentence_transformers import SentenceTransformer
 from chromadb import PersistentClient
@@ -18,19 +19,27 @@ DATA_DIR.mkdir(exist_ok=True)
 DB_PATH = DATA_DIR / "unique_articles.db"
 CHROMA_DIR = DATA_DIR / "chroma_store"
 
+ARTICLE_CHUNK_SIZE = 1000
+CHROMA_BATCH_SIZE = 512
+
 
 # ===============================
 # LOAD ARTICLES FROM SQLITE
 # ===============================
 
-def load_unique_articles():
+def iter_unique_articles(chunksize=ARTICLE_CHUNK_SIZE):
     try:
         conn = sqlite3.connect(DB_PATH)
-        df = pd.read_sql_query("SELECT * FROM unique_articles", conn)
-        conn.close()
-
-        logger.info(f"Loaded {len(df)} unique articles for embedding")
-        return df
+        try:
+            for chunk in pd.read_sql_query(
+                "SELECT id, clean_text, source, published_at FROM unique_articles",
+                conn,
+                chunksize=chunksize
+            ):
+                logger.info(f"Loaded {len(chunk)} unique articles for embedding")
+                yield chunk
+        finally:
+            conn.close()
     except Exception as e:
         logger.error(f"Error loading unique articles: {e}")
         raise
@@ -40,7 +49,10 @@ def load_unique_articles():
 # LOAD EMBEDDING MODEL
 # ===============================
 
-model = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
+DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
+model = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2", device=DEVICE)
+if DEVICE == "cuda":
+    model.half()
 
 
 # ===============================
@@ -64,22 +76,26 @@ def embed_and_store(df):
     ids = df["id"].astype(str).tolist()
 
     logger.info("Generating embeddings...")
-    embeds = model.encode(texts, show_progress_bar=True).tolist()
+    embeds = model.encode(
+        texts,
+        batch_size=256,
+        convert_to_numpy=True,
+        normalize_embeddings=True,
+        show_progress_bar=True
+    ).tolist()
 
     logger.info("Storing embeddings into ChromaDB...")
 
-    collection.add(
-        ids=ids,
-        documents=texts,
-        embeddings=embeds,
-        metadatas=[
-            {
-                "source": df.iloc[i].source,
-                "published_at": df.iloc[i].published_at
-            }
-            for i in range(len(df))
-        ]
-    )
+    metadatas = df[["source", "published_at"]].to_dict(orient="records")
+
+    for i in range(0, len(ids), CHROMA_BATCH_SIZE):
+        batch = slice(i, i + CHROMA_BATCH_SIZE)
+        collection.add(
+            ids=ids[batch],
+            documents=texts[batch],
+            embeddings=embeds[batch],
+            metadatas=metadatas[batch]
+        )
 
     logger.info(f"Successfully saved {len(df)} embeddings to ChromaDB")
 
@@ -91,8 +107,9 @@ def embed_and_store(df):
 def run_embedding():
     logger.info("Starting embedding pipeline...")
 
-    df = load_unique_articles()
-    embed_and_store(df)
+    # Stream articles in chunks so memory stays bounded on large tables
+    for df in iter_unique_articles():
+        embed_and_store(df)
 
     logger.info("Embedding pipeline completed successfully.")
 
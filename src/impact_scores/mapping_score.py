@@ -1,12 +1,14 @@
 # impact_full.py
 
 import sqlite3
+import re
 import pandas as pd
 from transformers import AutoTokenizer, AutoModelForSequenceClassification
 import torch
 from pathlib import Path
 
 from utils.logger_system import get_logger
+from database_connec.sqlite_connection import get_connection
 logger = get_logger("ImpactAnalysis")
 
 # ======================================================
@@ -16,12 +18,21 @@ DATA_DIR = Path(r"C:\Users\thang\Desktop\hackthon_project\data")
 UNIQUE_DB_PATH = DATA_DIR / "unique_articles.db"
 IMPACT_DB_PATH = DATA_DIR / "impact_scores.db"
 
+ARTICLE_CHUNK_SIZE = 1000
+
 # ======================================================
 # LOAD FINBERT
 # ======================================================
 model_name = "ProsusAI/finbert"
+DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
 tokenizer = AutoTokenizer.from_pretrained(model_name)
-model = AutoModelForSequenceClassification.from_pretrained(model_name)
+model = AutoModelForSequenceClassification.from_pretrained(model_name).to(DEVICE)
+if DEVICE == "cuda":
+    model.half()
+model.eval()
+
+SENTIMENT_LABELS = ["negative", "neutral", "positive"]
+SENTIMENT_BATCH_SIZE = 32
 
 logger.info("FinBERT loaded for sentiment scoring")
 
@@ -29,16 +40,30 @@ logger.info("FinBERT loaded for sentiment scoring")
 # ======================================================
 # FINBERT SENTIMENT
 # ======================================================
-def get_sentiment(text):
-    inputs = tokenizer(text[:512], return_tensors="pt", truncation=True)
-    outputs = model(**inputs)
-    scores = torch.nn.functional.softmax(outputs.logits, dim=1)[0]
+@torch.inference_mode()
+def get_sentiments(texts, batch_size=SENTIMENT_BATCH_SIZE):
+    sentiments, sentiment_scores = [], []
+
+    for i in range(0, len(texts), batch_size):
+        inputs = tokenizer(
+            texts[i:i + batch_size],
+            padding=True,
+            truncation=True,
+            max_length=512,
+            return_tensors="pt"
+        ).to(DEVICE)
+        probs = model(**inputs).logits.softmax(dim=-1)
+        scores, idx = probs.max(dim=-1)
+
+        sentiments.extend(SENTIMENT_LABELS[j] for j in idx.tolist())
+        sentiment_scores.extend(scores.float().tolist())
 
-    labels = ["negative", "neutral", "positive"]
-    sentiment = labels[scores.argmax().item()]
-    sentiment_score = float(scores.max().item())
+    return sentiments, sentiment_scores
 
-    return sentiment, sentiment_score
+
+def get_sentiment(text):
+    sentiments, sentiment_scores = get_sentiments([text])
+    return sentiments[0], sentiment_scores[0]
 
 
 # ======================================================
@@ -59,11 +84,20 @@ SECTOR_MAP = {
     "Dr Reddy": "Pharma"
 }
 
+# One case-insensitive pass over the text for all keywords. The lookahead
+# reports a match at every start position (overlaps included), so every
+# keyword the old substring checks would find is seen; the earliest
+# SECTOR_MAP entry among them still wins.
+SECTOR_RE = re.compile("(?=(" + "|".join(map(re.escape, SECTOR_MAP)) + "))", re.IGNORECASE)
+KEY_PRIORITY = {k.lower(): i for i, k in enumerate(SECTOR_MAP)}
+SECTORS_BY_PRIORITY = list(SECTOR_MAP.values())
+
 def detect_sector(text):
-    for keyword, sector in SECTOR_MAP.items():
-        if keyword.lower() in text.lower():
-            return sector
-    return "General"
+    best = min(
+        (KEY_PRIORITY[m.group(1).lower()] for m in SECTOR_RE.finditer(text)),
+        default=None
+    )
+    return SECTORS_BY_PRIORITY[best] if best is not None else "General"
 
 
 # ======================================================
@@ -78,12 +112,13 @@ MEDIUM_URGENCY_KEYWORDS = [
     "forecast", "upgrade", "downgrade", "quarterly", "earnings"
 ]
 
-def get_urgency(text):
-    t = text.lower()
+HIGH_URGENCY_RE = re.compile("|".join(map(re.escape, HIGH_URGENCY_KEYWORDS)), re.IGNORECASE)
+MEDIUM_URGENCY_RE = re.compile("|".join(map(re.escape, MEDIUM_URGENCY_KEYWORDS)), re.IGNORECASE)
 
-    if any(x in t for x in HIGH_URGENCY_KEYWORDS):
+def get_urgency(text):
+    if HIGH_URGENCY_RE.search(text):
         return "High"
-    if any(x in t for x in MEDIUM_URGENCY_KEYWORDS):
+    if MEDIUM_URGENCY_RE.search(text):
         return "Medium"
     return "Low"
 
@@ -104,19 +139,25 @@ def price_impact(sentiment, urgency):
 # ======================================================
 # LOAD UNIQUE ARTICLES
 # ======================================================
-def load_unique_articles():
+def iter_unique_articles(chunksize=ARTICLE_CHUNK_SIZE):
     conn = sqlite3.connect(UNIQUE_DB_PATH)
-    df = pd.read_sql_query("SELECT * FROM unique_articles", conn)
-    conn.close()
-    logger.info(f"Loaded {len(df)} unique articles for impact scoring")
-    return df
+    try:
+        for chunk in pd.read_sql_query(
+            "SELECT id, clean_text FROM unique_articles",
+            conn,
+            chunksize=chunksize
+        ):
+            logger.info(f"Loaded {len(chunk)} unique articles for impact scoring")
+            yield chunk
+    finally:
+        conn.close()
 
 
 # ======================================================
 # SAVE IMPACT RESULTS
 # ======================================================
 def save_impact_results(df):
-    conn = sqlite3.connect(IMPACT_DB_PATH)
+    conn = get_connection(IMPACT_DB_PATH)
     cur = conn.cursor()
 
     cur.execute("""
@@ -131,21 +172,18 @@ def save_impact_results(df):
         )
     """)
 
-    for _, row in df.iterrows():
-        cur.execute("""
+    rows = list(
+        df[["id", "sentiment", "sentiment_score", "sector", "urgency", "price_impact"]]
+        .itertuples(index=False, name=None)
+    )
+
+    with conn:
+        cur.executemany("""
             INSERT INTO impact_scores
             (article_id, sentiment, sentiment_score, sector, urgency, price_impact)
             VALUES (?, ?, ?, ?, ?, ?)
-        """, (
-            row["id"],
-            row["sentiment"],
-            row["sentiment_score"],
-            row["sector"],
-            row["urgency"],
-            row["price_impact"]
-        ))
-
-    conn.commit()
+        """, rows)
+
     conn.close()
     logger.info("Impact scores saved → impact_scores.db")
 
@@ -153,33 +191,36 @@ def save_impact_results(df):
 # ======================================================
 # MAIN PIPELINE
 # ======================================================
-def run_impact_pipeline():
-    logger.info("Starting impact scoring pipeline...")
+def score_articles(df):
+    texts = df["clean_text"].tolist()
 
-    df = load_unique_articles()
+    sentiments, sentiment_scores = get_sentiments(texts)
+    sectors = [detect_sector(text) for text in texts]
+    urgencies = [get_urgency(text) for text in texts]
+    impacts = [price_impact(s, u) for s, u in zip(sentiments, urgencies)]
 
-    results = []
+    return pd.DataFrame({
+        "id": df["id"].tolist(),
+        "sentiment": sentiments,
+        "sentiment_score": sentiment_scores,
+        "sector": sectors,
+        "urgency": urgencies,
+        "price_impact": impacts
+    })
 
-    for _, row in df.iterrows():
-        text = row["clean_text"]
 
-        sentiment, score = get_sentiment(text)
-        sector = detect_sector(text)
-        urgency = get_urgency(text)
-        impact = price_impact(sentiment, urgency)
+def run_impact_pipeline():
+    logger.info("Starting impact scoring pipeline...")
 
-        results.append({
-            "id": row["id"],
-            "sentiment": sentiment,
-            "sentiment_score": score,
-            "sector": sector,
-            "urgency": urgency,
-            "price_impact": impact
-        })
+    results = []
 
-    result_df = pd.DataFrame(results)
+    # Score and persist chunk by chunk; the returned frame still holds every row
+    for df in iter_unique_articles():
+        chunk_df = score_articles(df)
+        save_impact_results(chunk_df)
+        results.append(chunk_df)
 
-    save_impact_results(result_df)
+    result_df = pd.concat(results, ignore_index=True) if results else pd.DataFrame()
 
     logger.info("Impact scoring pipeline completed successfully")
 
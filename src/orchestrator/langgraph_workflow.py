@@ -1,7 +1,9 @@
 # langgraph_workflow_safe.py (improved)
-from dataclasses import dataclass, field, asdict
+from dataclasses import dataclass, field, fields, replace
 from typing import List, Dict, Any, Optional, Callable
 from datetime import datetime
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
 import time
 import logging
 import inspect
@@ -48,6 +50,11 @@ class WorkflowState:
     stats: Dict[str, Any] = field(default_factory=dict)
 
 # ---------- Helpers ----------
+@lru_cache(maxsize=None)
+def _param_count(fn: Callable) -> int:
+    # stage functions are fixed, so introspect each one only once
+    return len(inspect.signature(fn).parameters)
+
 def call_flexible(fn: Optional[Callable], *args, stage_name: str = ""):
     """
     Call fn with args if it accepts them; else call without args.
@@ -58,9 +65,8 @@ def call_flexible(fn: Optional[Callable], *args, stage_name: str = ""):
         return None
 
     try:
-        sig = inspect.signature(fn)
         # if fn accepts any parameters, pass them; otherwise call with no args
-        if len(sig.parameters) > 0:
+        if _param_count(fn) > 0:
             return fn(*args)
         else:
             return fn()
@@ -301,14 +307,50 @@ def finalize_agent(state: WorkflowState) -> WorkflowState:
     return state
 
 # ---------- Orchestration ----------
-def run_full_pipeline(query: Optional[str] = None) -> WorkflowState:
+# NER, embedding and impact scoring all read the deduplicated articles and
+# each writes only its own result field, so they can run side by side.
+ANALYSIS_STAGES = [
+    (ner_agent, ("extracted_entities",)),
+    (embedding_agent, ("embeddings_indexed",)),
+    (impact_scoring_agent, ("impact_scores",)),
+]
+
+def _merge(dst: WorkflowState, src: WorkflowState, written: tuple) -> WorkflowState:
+    for name in written:
+        setattr(dst, name, getattr(src, name))
+    dst.current_stage = src.current_stage
+    dst.stage_durations.extend(src.stage_durations)
+    dst.errors.extend(src.errors)
+    return dst
+
+def run_analysis_stages(st: WorkflowState) -> WorkflowState:
+    with ThreadPoolExecutor(max_workers=len(ANALYSIS_STAGES)) as ex:
+        # each stage gets its own durations/errors lists so results merge cleanly
+        futures = [
+            (ex.submit(agent, replace(st, stage_durations=[], errors=[])), written)
+            for agent, written in ANALYSIS_STAGES
+        ]
+        for future, written in futures:
+            st = _merge(st, future.result(), written)
+    return st
+
+def run_full_pipeline(query: Optional[str] = None, parallel_analysis: bool = False) -> WorkflowState:
+    """
+    NER, embedding and impact scoring run one after another by default.
+    Each of those modules moves its model to CUDA whenever it is available,
+    so running them together would put all three on the same GPU; on CPU
+    they would oversubscribe the cores (and NER forks SpaCy workers).
+    Pass parallel_analysis=True only when the stages use separate devices.
+    """
     st = WorkflowState(query=query or "")
     st = ingestion_agent(st)
     st = preprocessing_agent(st)
     st = deduplication_agent(st)
-    st = ner_agent(st)
-    st = embedding_agent(st)
-    st = impact_scoring_agent(st)
+    if parallel_analysis:
+        st = run_analysis_stages(st)
+    else:
+        for agent, _ in ANALYSIS_STAGES:
+            st = agent(st)
     # conditional query
     if st.query:
         st = query_agent(st)
@@ -318,4 +360,10 @@ def run_full_pipeline(query: Optional[str] = None) -> WorkflowState:
 if __name__ == "__main__":
     state = run_full_pipeline(query="What happened to Tesla today?")
     import pprint
-    pprint.pprint(asdict(state), width=120)
+    # shallow summary — asdict() would deep-copy every article in the state
+    summary = {
+        f.name: getattr(state, f.name)
+        for f in fields(state)
+        if f.name in {"stats", "current_stage", "errors"}
+    }
+    pprint.pprint(summary, width=120)
@@ -1,24 +1,53 @@
 # preprocessing_full.py
 
-import sqlite3
+import os
 import pandas as pd
 import re
 from bs4 import BeautifulSoup
 from pathlib import Path
 from datetime import datetime
+from multiprocessing import Pool
+from contextlib import nullcontext
+
+from database_connec.sqlite_connection import get_connection
 
 DB_PATH = Path(r"C:\Users\thang\Desktop\hackthon_project\data\articles.db")
 
+# Worker processes for BeautifulSoup parsing; 1 keeps everything in-process.
+# The pool is opt-in: on Windows it uses spawn, which re-imports __main__
+# (under the orchestrator that loads every stage's models) in each worker,
+# so it is capped and only started when the table is big enough to pay
+# that back.
+PREPROCESS_WORKERS = 1
+PREPROCESS_MAX_WORKERS = 4
+PREPROCESS_POOL_MIN_ARTICLES = 20000
+ARTICLE_CHUNK_SIZE = 1000
+
 
 # ============================
 # 1. LOAD RAW ARTICLES
 # ============================
 
-def load_raw_articles():
-    conn = sqlite3.connect(DB_PATH)
-    df = pd.read_sql_query("SELECT * FROM raw_articles", conn)
-    conn.close()
-    return df
+def iter_raw_articles(chunksize=ARTICLE_CHUNK_SIZE):
+    # WAL connection: save_processed writes to this same file while the
+    # read cursor is still open
+    conn = get_connection(DB_PATH)
+    try:
+        yield from pd.read_sql_query(
+            "SELECT id, title, content, source, published_at FROM raw_articles",
+            conn,
+            chunksize=chunksize
+        )
+    finally:
+        conn.close()
+
+
+def count_raw_articles():
+    conn = get_connection(DB_PATH)
+    try:
+        return conn.execute("SELECT COUNT(*) FROM raw_articles").fetchone()[0]
+    finally:
+        conn.close()
 
 
 # ============================
@@ -29,7 +58,7 @@ def clean_html(text):
     if not text:
         return ""
 
-    soup = BeautifulSoup(text, "html.parser")
+    soup = BeautifulSoup(text, "lxml")
 
     # remove JS & CSS
     for script in soup(["script", "style"]):
@@ -43,24 +72,31 @@ def clean_html(text):
 # 3. TEXT NORMALIZATION
 # ============================
 
+# remove disclaimers
+BAD_PHRASES = [
+    "ADVERTISEMENT",
+    "Read more on ET Markets",
+    "Download The Economic Times",
+    "Read more",
+    "Reuters Graphics"
+]
+
+# Compiled once; longer phrases come first so they win over their prefixes
+_WS = re.compile(r"\s+")
+_URL = re.compile(r"http\S+")
+_BAD = re.compile("|".join(map(re.escape, BAD_PHRASES)))
+
+
 def normalize_text(text):
     if not text:
         return ""
 
-    text = re.sub(r"\s+", " ", text)  # collapse spaces
-    text = re.sub(r"[\r\n\t]", " ", text)
-    text = re.sub(r"http\S+", "", text)  # remove URLs
-
-    # remove disclaimers
-    bad_phrases = [
-        "ADVERTISEMENT",
-        "Read more on ET Markets",
-        "Download The Economic Times",
-        "Read more",
-        "Reuters Graphics"
-    ]
-    for phrase in bad_phrases:
-        text = text.replace(phrase, "")
+    text = _WS.sub(" ", text)  # collapse spaces (also covers \r, \n, \t)
+    text = _URL.sub("", text)  # remove URLs
+    # a removal can join the halves of another phrase, so repeat until clean
+    removed = 1
+    while removed:
+        text, removed = _BAD.subn("", text)
 
     return text.strip()
 
@@ -86,7 +122,7 @@ def preprocess_article(row):
 # ============================
 
 def save_processed(df):
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_connection(DB_PATH)
     cur = conn.cursor()
 
     cur.execute("""
@@ -99,14 +135,17 @@ def save_processed(df):
         )
     """)
 
-    for _, row in df.iterrows():
-        cur.execute("""
-            INSERT INTO processed_articles
-            (raw_id, clean_text, source, published_at)
-            VALUES (?, ?, ?, ?)
-        """, (row["id"], row["clean_text"], row["source"], row["published_at"]))
+    # multi-row INSERTs in one transaction; 200 rows x 4 columns stays under
+    # the 999 bound-parameter limit of older SQLite builds
+    df.rename(columns={"id": "raw_id"})[["raw_id", "clean_text", "source", "published_at"]].to_sql(
+        "processed_articles",
+        conn,
+        if_exists="append",
+        index=False,
+        method="multi",
+        chunksize=200
+    )
 
-    conn.commit()
     conn.close()
 
     print("Processed articles saved → processed_articles table")
@@ -118,17 +157,34 @@ def save_processed(df):
 
 def run_preprocessing():
     print("Loading raw articles...")
-    df = load_raw_articles()
 
-    print("Cleaning & normalizing...")
-    df["clean_text"] = df.apply(preprocess_article, axis=1)
+    cleaned = []
 
-    # remove empty
-    df = df[df["clean_text"].str.len() > 50]
+    workers = min(PREPROCESS_WORKERS, PREPROCESS_MAX_WORKERS, os.cpu_count() or 1)
+    use_pool = (
+        workers > 1
+        and count_raw_articles() >= PREPROCESS_POOL_MIN_ARTICLES
+    )
 
-    print(f"Final cleaned count: {len(df)}")
+    # clean and persist chunk by chunk; the returned frame still holds every row
+    with (Pool(workers) if use_pool else nullcontext()) as pool:
+        for df in iter_raw_articles():
+            print(f"Cleaning & normalizing {len(df)} articles...")
+            if pool is not None:
+                records = df[["title", "content"]].to_dict("records")
+                df["clean_text"] = pool.map(preprocess_article, records, chunksize=64)
+            else:
+                df["clean_text"] = df.apply(preprocess_article, axis=1)
+
+            # remove empty
+            df = df[df["clean_text"].str.len() > 50]
 
-    save_processed(df)
+            save_processed(df)
+            cleaned.append(df)
+
+    df = pd.concat(cleaned, ignore_index=True) if cleaned else pd.DataFrame()
+
+    print(f"Final cleaned count: {len(df)}")
 
     return df
 
@@ -1,3 +1,6 @@
+from functools import cache, lru_cache
+from typing import List, Union
+import torch
 from sentence_transformers import SentenceTransformer
 from chromadb import PersistentClient
 from pathlib import Path
@@ -5,19 +8,42 @@ from pathlib import Path
 CHROMA_DIR = Path(r"C:\Users\thang\Desktop\hackthon_project\data\chroma_store")
 
 # Load model
-model = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
+DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
+model = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2", device=DEVICE)
 
-# Load vectorDB
-client = PersistentClient(path=str(CHROMA_DIR))
-collection = client.get_collection("financial_news")
+# Load vectorDB — one client per process, opened on first query so that
+# importing this module doesn't require the collection to exist yet
+@cache
+def _collection():
+    client = PersistentClient(path=str(CHROMA_DIR))
+    return client.get_collection("financial_news")
 
 
-def semantic_query(query: str, top_k: int = 5):
-    query_emb = model.encode(query).tolist()
+@lru_cache(maxsize=1024)
+def _encode_query(query: str):
+    # read-only so the cached embedding can't be mutated by a caller
+    emb = model.encode([query], normalize_embeddings=True, convert_to_numpy=True)
+    emb.setflags(write=False)
+    return emb
 
-    results = collection.query(
-        query_embeddings=[query_emb],
-        n_results=top_k
+
+def semantic_query(queries: Union[str, List[str]], top_k: int = 5):
+    if isinstance(queries, str):
+        query_embs = _encode_query(queries).tolist()
+    else:
+        # one batched forward pass + one Chroma round-trip for all queries
+        query_embs = model.encode(
+            list(queries),
+            batch_size=64,
+            normalize_embeddings=True,
+            convert_to_numpy=True
+        ).tolist()
+
+    # lists of floats: older chromadb releases reject ndarray query embeddings
+    results = _collection().query(
+        query_embeddings=query_embs,
+        n_results=top_k,
+        include=["documents", "metadatas", "distances"]  # skip returning embeddings
     )
 
     return results